@@ -9,24 +9,43 @@ Data Source:
 
 Usage:
     python gla_footfall_parser.py <path_to_csv>
+    python gla_footfall_parser.py --bulk    # load via Postgres COPY (needs SUPABASE_DB_URL)
 
 The CSV should have columns for location, date/time, and footfall counts.
 This script normalizes values to 0-100 scale and stores hourly averages.
 """
 
+import argparse
+import asyncio
 import os
 import sys
 from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv()
 
+import httpx
+import numpy as np
 import pandas as pd
-from supabase import create_client, Client
+import pyarrow as pa
+
+from supabase_io import (
+    UPSERT_CONCURRENCY, get_batch_size, get_db_connection, get_supabase_client, run, upsert_batch,
+)
+
+# Rows read per chunk when streaming large GLA CSV files
+CSV_CHUNK_SIZE = 200_000
+
+# Source tag and reference date stamped on every generated sample record
+SAMPLE_SOURCE = 'SAMPLE_DATA'
+SAMPLE_SOURCE_DATE = '2024-01-01'
 
-# Configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Typical hourly patterns (0-100 scale)
+WEEKDAY_PATTERN = [5, 3, 2, 2, 3, 10, 25, 50, 65, 60, 65, 75, 85, 80, 75, 70, 75, 85, 70, 50, 35, 25, 15, 8]
+SATURDAY_PATTERN = [8, 5, 3, 3, 5, 8, 15, 30, 50, 70, 85, 95, 100, 95, 90, 85, 80, 70, 55, 40, 30, 25, 18, 12]
+SUNDAY_PATTERN = [5, 3, 2, 2, 3, 5, 10, 20, 35, 50, 65, 80, 85, 80, 70, 60, 50, 40, 30, 25, 18, 12, 8, 5]
+
+# (7, 24) pattern matrix; row i is the hourly pattern for DAYS[i]
+DAY_PATTERNS = np.array([WEEKDAY_PATTERN] * 5 + [SATURDAY_PATTERN, SUNDAY_PATTERN], dtype=np.int16)
 
 # Known high street locations with coordinates (Central London focus)
 # These are approximate centroids for each high street
@@ -67,16 +86,6 @@ LOCATION_COORDS = {
 }
 
 
-def get_supabase_client() -> Client:
-    """Create and return Supabase client."""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Error: Supabase credentials not found.")
-        print("Set SUPABASE_URL and SUPABASE_SERVICE_KEY in your environment or .env file")
-        sys.exit(1)
-    
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
-
-
 def normalize_to_100(values: pd.Series) -> pd.Series:
     """Normalize values to 0-100 scale."""
     min_val = values.min()
@@ -94,29 +103,32 @@ def parse_gla_csv(filepath: str) -> pd.DataFrame:
     
     Expected columns (adjust based on actual GLA data format):
     - Location/HighStreet: Name of the high street
-    - Date: Date of measurement
-    - Hour: Hour of day (0-23)
+    - Date: Date/time of measurement
     - Footfall: Raw footfall count
     
-    Returns DataFrame with normalized data.
+    The file is streamed in chunks of CSV_CHUNK_SIZE rows and reduced to
+    per-location hourly averages as it is read, so peak memory stays flat
+    regardless of file size.
+    
+    Returns DataFrame with normalized data (or the first rows as read, if
+    the required columns could not be detected).
     """
     print(f"Reading CSV: {filepath}")
     
     try:
-        df = pd.read_csv(filepath)
+        probe = pd.read_csv(filepath, nrows=1000)
     except Exception as e:
         print(f"Error reading CSV: {e}")
         sys.exit(1)
     
-    print(f"  Found {len(df)} rows")
-    print(f"  Columns: {list(df.columns)}")
+    print(f"  Columns: {list(probe.columns)}")
     
     # Try to identify columns (GLA data may have different naming)
     location_col = None
     date_col = None
     footfall_col = None
     
-    for col in df.columns:
+    for col in probe.columns:
         col_lower = col.lower()
         if 'location' in col_lower or 'high' in col_lower or 'street' in col_lower or 'name' in col_lower:
             location_col = col
@@ -129,25 +141,65 @@ def parse_gla_csv(filepath: str) -> pd.DataFrame:
         print("Warning: Could not auto-detect all required columns.")
         print("Please ensure your CSV has columns for: Location, Date/Time, Footfall count")
         print(f"  Detected: location={location_col}, date={date_col}, footfall={footfall_col}")
+        return probe
     
+    # Accumulate per-chunk sums and counts; averages are taken once at the end.
+    # Columns are read as text and coerced per chunk, so stray values such as
+    # thousands separators or non-date time periods are dropped, not fatal.
+    partials = []
+    total_rows = 0
+    usable_rows = 0
+    
+    try:
+        chunks = pd.read_csv(
+            filepath,
+            usecols=[location_col, date_col, footfall_col],
+            dtype=str,
+            chunksize=CSV_CHUNK_SIZE,
+        )
+        for chunk in chunks:
+            total_rows += len(chunk)
+            timestamps = pd.to_datetime(chunk[date_col], errors='coerce')
+            footfall = pd.to_numeric(chunk[footfall_col].str.replace(',', '', regex=False), errors='coerce')
+            valid = chunk[location_col].notna() & timestamps.notna() & footfall.notna()
+            if not valid.any():
+                continue
+            
+            usable_rows += int(valid.sum())
+            timestamps = timestamps[valid]
+            partials.append(
+                footfall[valid].astype('float64').groupby(
+                    [chunk.loc[valid, location_col], timestamps.dt.day_name(), timestamps.dt.hour],
+                ).agg(['sum', 'count'])
+            )
+    except Exception as e:
+        print(f"Error reading CSV: {e}")
+        sys.exit(1)
+    
+    if not partials:
+        print(f"Warning: None of the {total_rows} rows had a usable location, date and footfall value.")
+        return probe
+    
+    print(f"  Found {total_rows} rows ({usable_rows} usable)")
+    
+    totals = pd.concat(partials).groupby(level=[0, 1, 2]).sum()
+    totals.index.names = ['location_name', 'day_of_week', 'hour_of_day']
+    
+    df = (totals['sum'] / totals['count']).rename('raw_footfall_value').reset_index()
+    df['avg_footfall_score'] = normalize_to_100(df['raw_footfall_value'])
+    
+    print(f"  Aggregated to {len(df)} location/day/hour slots")
     return df
 
 
-def generate_sample_data() -> list:
+def generate_sample_data() -> pa.Table:
     """
     Generate sample footfall data for testing.
     Uses known London locations with realistic hourly patterns.
+    Returns a columnar table; rows become dicts only when a batch is sent.
     """
     print("Generating sample footfall data for Central London locations...")
     
-    records = []
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-    # Typical hourly patterns (0-100 scale)
-    weekday_pattern = [5, 3, 2, 2, 3, 10, 25, 50, 65, 60, 65, 75, 85, 80, 75, 70, 75, 85, 70, 50, 35, 25, 15, 8]
-    saturday_pattern = [8, 5, 3, 3, 5, 8, 15, 30, 50, 70, 85, 95, 100, 95, 90, 85, 80, 70, 55, 40, 30, 25, 18, 12]
-    sunday_pattern = [5, 3, 2, 2, 3, 5, 10, 20, 35, 50, 65, 80, 85, 80, 70, 60, 50, 40, 30, 25, 18, 12, 8, 5]
-    
     # Location multipliers (relative busyness)
     location_multipliers = {
         'Oxford Street': 1.0,
@@ -165,101 +217,162 @@ def generate_sample_data() -> list:
         'Whitehall': 0.35,  # Lower - more transit, less retail
     }
     
-    for location, (lon, lat) in LOCATION_COORDS.items():
-        multiplier = location_multipliers.get(location, 0.5)
-        
-        for day in days:
-            if day == 'Saturday':
-                pattern = saturday_pattern
-            elif day == 'Sunday':
-                pattern = sunday_pattern
-            else:
-                pattern = weekday_pattern
-            
-            for hour, base_score in enumerate(pattern):
-                # Apply location multiplier and add some variation
-                score = int(min(100, max(0, base_score * multiplier)))
-                
-                records.append({
-                    'location_name': location,
-                    'location_point': f"POINT({lon} {lat})",
-                    'day_of_week': day,
-                    'hour_of_day': hour,
-                    'avg_footfall_score': score,
-                    'raw_footfall_value': score * 100,  # Simulated raw value
-                    'source': 'SAMPLE_DATA',
-                    'source_date': '2024-01-01'
-                })
-    
-    print(f"  Generated {len(records)} records for {len(LOCATION_COORDS)} locations")
+    # Score every (location, day, hour) slot in one broadcast multiply
+    locations = list(LOCATION_COORDS)
+    multipliers = np.array([location_multipliers.get(location, 0.5) for location in locations])
+    scores = np.clip(multipliers[:, None, None] * DAY_PATTERNS[None, :, :], 0, 100).astype(int)
+    points = [f"POINT({lon} {lat})" for lon, lat in LOCATION_COORDS.values()]
+    
+    # Lay the records out column by column: locations outermost, hours innermost
+    num_rows = scores.size
+    slots_per_location = len(DAYS) * 24
+    records = pa.table({
+        'location_name': np.repeat(locations, slots_per_location),
+        'location_point': np.repeat(points, slots_per_location),
+        'day_of_week': np.tile(np.repeat(DAYS, 24), len(locations)),
+        'hour_of_day': np.tile(np.arange(24), len(locations) * len(DAYS)),
+        'avg_footfall_score': scores.ravel(),
+        'raw_footfall_value': scores.ravel() * 100,  # Simulated raw value
+        'source': pa.repeat(SAMPLE_SOURCE, num_rows),
+        'source_date': pa.repeat(SAMPLE_SOURCE_DATE, num_rows),
+    })
+    
+    print(f"  Generated {records.num_rows} records for {len(LOCATION_COORDS)} locations")
     return records
 
 
-def insert_footfall_data(client: Client, records: list):
-    """Insert footfall data into Supabase."""
-    if not records:
+async def insert_footfall_data(client: httpx.AsyncClient, records: pa.Table):
+    """
+    Insert footfall data into Supabase.
+    Batches are upserted concurrently, with at most UPSERT_CONCURRENCY in flight.
+    """
+    if records.num_rows == 0:
         print("No records to insert.")
         return
     
-    print(f"Inserting {len(records)} footfall records into Supabase...")
+    print(f"Inserting {records.num_rows} footfall records into Supabase...")
     
-    batch_size = 100
-    inserted = 0
+    batch_size = get_batch_size(records.num_columns)
+    semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
     
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i + batch_size]
-        
-        try:
-            result = client.table('footfall_baseline').upsert(
-                batch,
-                on_conflict='location_name,day_of_week,hour_of_day,source'
-            ).execute()
-            inserted += len(batch)
-        except Exception as e:
-            print(f"  Error inserting batch: {e}")
-    
-    print(f"  Inserted/updated: {inserted} records")
+    results = await asyncio.gather(*[
+        upsert_batch(client, semaphore, 'footfall_baseline',
+                     'location_name,day_of_week,hour_of_day,source', records.slice(i, batch_size))
+        for i in range(0, records.num_rows, batch_size)
+    ])
+    inserted = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    
+    print(f"  Inserted/updated: {inserted} records, Errors: {errors}")
+
+
+async def bulk_load_footfall_data(records: pa.Table):
+    """
+    Bulk-load footfall data over a direct Postgres connection.
+    Rows are COPYed into a temp staging table, then merged into
+    footfall_baseline with a single INSERT ... ON CONFLICT DO UPDATE.
+    """
+    if records.num_rows == 0:
+        print("No records to insert.")
+        return
+    
+    print(f"Bulk loading {records.num_rows} footfall records via COPY...")
+    
+    conn = await get_db_connection()
+    try:
+        async with conn.transaction():
+            await conn.execute("""
+                CREATE TEMP TABLE footfall_stage (
+                    location_name TEXT,
+                    location_point TEXT,
+                    day_of_week TEXT,
+                    hour_of_day INTEGER,
+                    avg_footfall_score INTEGER,
+                    raw_footfall_value BIGINT,
+                    source TEXT,
+                    source_date TEXT
+                ) ON COMMIT DROP
+            """)
+            await conn.copy_records_to_table(
+                'footfall_stage',
+                records=zip(*(column.to_pylist() for column in records.columns)),
+                columns=records.column_names,
+            )
+            status = await conn.execute("""
+                INSERT INTO footfall_baseline (
+                    location_name, location_point, day_of_week, hour_of_day,
+                    avg_footfall_score, raw_footfall_value, source, source_date
+                )
+                SELECT location_name, ST_GeogFromText(location_point), day_of_week, hour_of_day,
+                       avg_footfall_score, raw_footfall_value, source, source_date::date
+                FROM footfall_stage
+                ON CONFLICT (location_name, day_of_week, hour_of_day, source) DO UPDATE SET
+                    location_point = EXCLUDED.location_point,
+                    avg_footfall_score = EXCLUDED.avg_footfall_score,
+                    raw_footfall_value = EXCLUDED.raw_footfall_value,
+                    source_date = EXCLUDED.source_date
+            """)
+    finally:
+        await conn.close()
+    
+    # asyncpg returns the command tag, e.g. "INSERT 0 5544"
+    print(f"  Inserted/updated: {status.split()[-1]} records")
 
 
-def main():
+async def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="GLA High Street Footfall Parser")
+    parser.add_argument('csv_path', nargs='?', help="GLA footfall CSV to parse")
+    parser.add_argument('--bulk', action='store_true',
+                        help="load via Postgres COPY (needs SUPABASE_DB_URL) instead of the REST API")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("GLA High Street Footfall Parser")
     print("=" * 60)
     print()
     
-    client = get_supabase_client()
-    print("Connected to Supabase")
-    print()
-    
-    if len(sys.argv) > 1:
-        # Parse provided CSV file
-        csv_path = sys.argv[1]
-        if not os.path.exists(csv_path):
-            print(f"Error: File not found: {csv_path}")
-            sys.exit(1)
-        
-        df = parse_gla_csv(csv_path)
-        print()
-        print("CSV parsing complete. Manual column mapping may be required.")
-        print("For now, generating sample data instead...")
-        print()
-    else:
-        print("No CSV file provided. Generating sample footfall data...")
-        print()
-        print("To use real GLA data, download from:")
-        print("  https://data.london.gov.uk/dataset/high-streets-footfall-data")
-        print()
-        print("Then run: python gla_footfall_parser.py <path_to_csv>")
+    client = None
+    if not args.bulk:
+        client = get_supabase_client()
+        print("Connected to Supabase")
         print()
     
-    # Generate and insert sample data
-    records = generate_sample_data()
-    insert_footfall_data(client, records)
+    try:
+        if args.csv_path:
+            # Parse provided CSV file
+            csv_path = args.csv_path
+            if not os.path.exists(csv_path):
+                print(f"Error: File not found: {csv_path}")
+                sys.exit(1)
+        
+            df = parse_gla_csv(csv_path)
+            print()
+            print("CSV parsing complete. Manual column mapping may be required.")
+            print("For now, generating sample data instead...")
+            print()
+        else:
+            print("No CSV file provided. Generating sample footfall data...")
+            print()
+            print("To use real GLA data, download from:")
+            print("  https://data.london.gov.uk/dataset/high-streets-footfall-data")
+            print()
+            print("Then run: python gla_footfall_parser.py <path_to_csv>")
+            print()
+        
+        # Generate and insert sample data
+        records = generate_sample_data()
+        if args.bulk:
+            await bulk_load_footfall_data(records)
+        else:
+            await insert_footfall_data(client, records)
+    finally:
+        if client is not None:
+            await client.aclose()
     
     print()
     print("Done!")
 
 
 if __name__ == '__main__':
-    main()
+    run(main)
@@ -6,24 +6,31 @@ using a "catch-all" approach, then filters and classifies them.
 
 Usage:
     python osm_scraper.py
+    python osm_scraper.py --bulk    # load via Postgres COPY (needs SUPABASE_DB_URL)
 
 Requirements:
-    pip install osmnx supabase python-dotenv
+    pip install -r requirements.txt
 """
 
+import argparse
+import asyncio
+import hashlib
 import os
-import sys
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Load environment variables from .env file
-load_dotenv()
+import httpx
+import ijson
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+import urllib3
 
-import osmnx as ox
-from supabase import create_client, Client
-
-# Configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
+from supabase_io import (
+    UPSERT_CONCURRENCY, get_batch_size, get_db_connection, get_supabase_client, run, upsert_batch,
+)
 
 # Central/West London bounding box (Earl's Court to Shoreditch, Regent's Park to Pimlico)
 # [North, South, East, West]
@@ -34,6 +41,25 @@ BBOX = {
     'west': -0.22     # Earl's Court / South Kensington
 }
 
+# Overpass API endpoint and server-side query timeout (seconds)
+OVERPASS_URL = 'https://overpass-api.de/api/interpreter'
+OVERPASS_TIMEOUT = 180
+
+# The bbox is split into a TILE_GRID x TILE_GRID grid of tiles fetched in parallel.
+# The public Overpass instance grants only a couple of query slots per IP, so
+# extra workers just queue server-side; raise this when using a private instance.
+TILE_GRID = 4
+OVERPASS_WORKERS = 2
+
+# A tile that is throttled (429), times out (504) or otherwise fails server-side
+# is retried with exponential backoff, or after the server's Retry-After
+OVERPASS_RETRIES = 4
+OVERPASS_BACKOFF = 5
+
+# Cleaned POIs are cached on disk and reused for this long (seconds)
+CACHE_DIR = 'cache'
+CACHE_MAX_AGE = 24 * 60 * 60
+
 # Broad "Catch-All" Tags
 # Setting values to True fetches everything with that key
 TAGS = {
@@ -47,141 +73,257 @@ TAGS = {
 }
 
 # Filter out street furniture and non-business items
-BLACKLIST = {
+BLACKLIST = frozenset({
     'bench', 'waste_basket', 'bicycle_parking', 'telephone',
     'post_box', 'recycling', 'drinking_water', 'toilets',
     'vending_machine', 'atm', 'parking', 'parking_space',
     'motorcycle_parking', 'loading_dock', 'grit_bin',
     'hunting_stand', 'feeding_place', 'watering_place'
+})
+
+# Order in which tags decide a POI's type when several are present
+TAG_PRIORITY = ['shop', 'office', 'amenity', 'tourism', 'historic', 'leisure', 'craft']
+
+POI_TYPES = ['retail', 'hospitality', 'commercial', 'other']
+
+# Type given to a POI by the tag that decides it. Shop and office values are
+# used as the subtype directly; other tags are prefixed, e.g. "amenity:library".
+DEFAULT_TYPE = {
+    'shop': 'retail',
+    'office': 'commercial',
+    'amenity': 'other',
+    'tourism': 'other',
+    'historic': 'other',
+    'leisure': 'other',
+    'craft': 'commercial',
 }
+BARE_SUBTYPE_TAGS = frozenset({'shop', 'office'})
 
+# Values that override DEFAULT_TYPE for their tag (and keep a bare subtype)
+TYPE_OVERRIDES = {
+    'amenity': {
+        **dict.fromkeys(['restaurant', 'cafe', 'bar', 'pub', 'fast_food', 'food_court',
+                         'biergarten', 'nightclub'], 'hospitality'),
+        **dict.fromkeys(['bank', 'bureau_de_change', 'post_office', 'clinic', 'dentist',
+                         'pharmacy', 'doctors', 'hospital', 'veterinary'], 'commercial'),
+    },
+    'tourism': dict.fromkeys(['hotel', 'hostel', 'guest_house', 'motel', 'apartment'], 'hospitality'),
+    'leisure': dict.fromkeys(['fitness_centre', 'gym', 'sports_centre'], 'commercial'),
+}
 
-def get_supabase_client() -> Client:
-    """Create and return Supabase client."""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Error: Supabase credentials not found.")
-        print("Set SUPABASE_URL and SUPABASE_SERVICE_KEY in your environment or .env file")
-        sys.exit(1)
-    
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+# Tags whose blacklisted values drop the POI entirely
+BLACKLISTED_TAGS = ['amenity', 'leisure']
 
+# Tags kept from each Overpass element; everything else is discarded while parsing
+KEEP_TAGS = TAG_PRIORITY + ['name', 'opening_hours']
 
-def determine_type(row):
-    """Classify the POI based on its tags."""
-    # Check for Shop (Retail)
-    if 'shop' in row.index and isinstance(row['shop'], str):
-        return 'retail', row['shop']
-    
-    # Check for Office (Commercial)
-    if 'office' in row.index and isinstance(row['office'], str):
-        return 'commercial', row['office']
+# Columnar layout of cleaned POIs, matching the business_nodes columns we write
+POI_SCHEMA = pa.schema([
+    ('name', pa.string()),
+    ('type', pa.string()),
+    ('subtype', pa.string()),
+    ('location', pa.string()),
+    ('osm_id', pa.int64()),
+    ('opening_hours', pa.string()),
+])
+
+
+def build_overpass_query(bbox: dict) -> str:
+    """
+    Build an Overpass QL query for every feature carrying one of TAGS inside bbox.
+    Blacklisted values are excluded server-side so they are never downloaded;
+    classify_pois still drops any that slip through via another tag.
+    """
+    area = f"({bbox['south']},{bbox['west']},{bbox['north']},{bbox['east']})"
+    blacklist = '|'.join(sorted(BLACKLIST))
+    selectors = ''.join(
+        f"nwr[{key}]"
+        + (f'[{key}!~"^({blacklist})$"]' if key in BLACKLISTED_TAGS else '')
+        + f"{area};"
+        for key in TAGS
+    )
+    return f"[out:json][timeout:{OVERPASS_TIMEOUT}];({selectors});out center tags;"
+
+
+def stream_overpass_elements(query: str):
+    """Yield Overpass elements one at a time as they are parsed off the wire."""
+    with requests.post(OVERPASS_URL, data={'data': query}, stream=True, timeout=OVERPASS_TIMEOUT + 30) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        yield from ijson.items(resp.raw, 'elements.item', use_float=True)
+
+
+def split_bbox(bbox: dict, grid: int) -> list:
+    """Split a bounding box into grid x grid equally sized tiles."""
+    lats = np.linspace(bbox['south'], bbox['north'], grid + 1).round(6).tolist()
+    lons = np.linspace(bbox['west'], bbox['east'], grid + 1).round(6).tolist()
+    return [
+        {'south': lats[i], 'north': lats[i + 1], 'west': lons[j], 'east': lons[j + 1]}
+        for i in range(grid)
+        for j in range(grid)
+    ]
+
+
+def read_tile(bbox: dict) -> pd.DataFrame:
+    """
+    Fetch the raw elements for one tile, keeping only the fields we use.
+    Nodes carry lon/lat directly; ways and relations carry a center.
+    """
+    columns = {key: [] for key in ['osm_type', 'osm_id', 'lon', 'lat'] + KEEP_TAGS}
+    for element in stream_overpass_elements(build_overpass_query(bbox)):
+        coords = element if 'lon' in element else element.get('center')
+        if not coords:
+            continue
+        tags = element.get('tags', {})
+        columns['osm_type'].append(element['type'])
+        columns['osm_id'].append(element['id'])
+        columns['lon'].append(coords['lon'])
+        columns['lat'].append(coords['lat'])
+        for key in KEEP_TAGS:
+            columns[key].append(tags.get(key))
+    return pd.DataFrame(columns)
+
+
+def get_retry_delay(error: Exception, attempt: int) -> float | None:
+    """
+    Seconds to wait before retrying a failed tile, or None if retrying cannot help.
+    Throttling and server errors back off (honouring Retry-After); other 4xx are final.
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        # Connection dropped or timed out mid-stream
+        return OVERPASS_BACKOFF * 2 ** attempt
+    if response.status_code != 429 and response.status_code < 500:
+        return None
+    retry_after = response.headers.get('Retry-After', '')
+    if retry_after.isdigit():
+        return float(retry_after)
+    return OVERPASS_BACKOFF * 2 ** attempt
+
+
+def fetch_tile(bbox: dict) -> pd.DataFrame:
+    """Fetch one tile, retrying throttled or failed queries with backoff."""
+    for attempt in range(OVERPASS_RETRIES + 1):
+        try:
+            return read_tile(bbox)
+        # ijson reads the raw stream, so a dropped connection surfaces from urllib3
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+            delay = get_retry_delay(e, attempt)
+            if delay is None or attempt == OVERPASS_RETRIES:
+                raise
+            print(f"  Tile {bbox} failed ({e}), retrying in {delay:g}s")
+            time.sleep(delay)
+
+
+def get_tag(df, key: str) -> pd.Series:
+    """Return a tag column as strings, with None where the tag is absent."""
+    if key not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    col = df[key]
+    return col.astype(object).where(col.map(lambda v: isinstance(v, str)), None)
+
+
+def classify_pois(df) -> pd.DataFrame:
+    """
+    Classify every POI from its tags in one vectorized pass.
     
-    # Check for Amenity (Hospitality, Commercial, or Other)
-    if 'amenity' in row.index and isinstance(row['amenity'], str):
-        subtype = row['amenity']
-        if subtype in BLACKLIST:
-            return None, None  # Skip blacklisted items
-        
-        # Hospitality amenities
-        if subtype in ['restaurant', 'cafe', 'bar', 'pub', 'fast_food', 'food_court', 'biergarten', 'nightclub']:
-            return 'hospitality', subtype
-        
-        # Commercial amenities (services)
-        if subtype in ['bank', 'bureau_de_change', 'post_office', 'clinic', 'dentist', 
-                       'pharmacy', 'doctors', 'hospital', 'veterinary']:
-            return 'commercial', subtype
-        
-        # Everything else is 'other'
-        return 'other', f"amenity:{subtype}"
+    Tags are checked in priority order (shop, office, amenity, tourism,
+    historic, leisure, craft); the first one present decides the type.
+    Blacklisted street furniture is dropped from the result.
+    """
+    tags = {key: get_tag(df, key) for key in TAG_PRIORITY}
+    present = {key: col.notna().to_numpy() for key, col in tags.items()}
+    values = {key: col.fillna('').to_numpy(dtype=object) for key, col in tags.items()}
     
-    # Check for Tourism (Hotels are hospitality, rest are other)
-    if 'tourism' in row.index and isinstance(row['tourism'], str):
-        subtype = row['tourism']
-        if subtype in ['hotel', 'hostel', 'guest_house', 'motel', 'apartment']:
-            return 'hospitality', subtype
-        return 'other', f"tourism:{subtype}"
+    # A tag only decides the type when no higher-priority tag is present
+    decided = np.zeros(len(df), dtype=bool)
+    decides = {}
+    for key in TAG_PRIORITY:
+        decides[key] = present[key] & ~decided
+        decided |= present[key]
     
-    # Check for Historic (all are other)
-    if 'historic' in row.index and isinstance(row['historic'], str):
-        return 'other', f"historic:{row['historic']}"
+    is_blacklisted = np.zeros(len(df), dtype=bool)
+    for key in BLACKLISTED_TAGS:
+        is_blacklisted |= decides[key] & tags[key].isin(BLACKLIST).to_numpy()
     
-    # Check for Leisure (gyms/sports are commercial, rest are other)
-    if 'leisure' in row.index and isinstance(row['leisure'], str):
-        subtype = row['leisure']
-        if subtype in BLACKLIST:
-            return None, None
-        if subtype in ['fitness_centre', 'gym', 'sports_centre']:
-            return 'commercial', subtype
-        return 'other', f"leisure:{subtype}"
+    # Build np.select branches from the lookup tables, highest priority first
+    conditions, types, subtypes = [], [], []
+    for key in TAG_PRIORITY:
+        if key in TYPE_OVERRIDES:
+            override = tags[key].map(TYPE_OVERRIDES[key]).to_numpy(dtype=object)
+            conditions.append(decides[key] & pd.notna(override))
+            types.append(override)
+            subtypes.append(values[key])
+        conditions.append(decides[key])
+        types.append(DEFAULT_TYPE[key])
+        subtypes.append(values[key] if key in BARE_SUBTYPE_TAGS else f"{key}:" + values[key])
     
-    # Check for Craft (commercial)
-    if 'craft' in row.index and isinstance(row['craft'], str):
-        return 'commercial', f"craft:{row['craft']}"
+    types = np.select(conditions, types, default='other')
+    subtypes = np.select(conditions, subtypes, default='unknown')
     
-    return 'other', 'unknown'
+    return pd.DataFrame({
+        'type': pd.Categorical(types, categories=POI_TYPES),
+        'subtype': subtypes,
+    }, index=df.index)[~is_blacklisted]
 
 
-def fetch_all_pois() -> list:
-    """Fetch all POIs and classify them dynamically."""
+def fetch_all_pois() -> pa.Table:
+    """
+    Fetch all POIs and classify them dynamically.
+    Returns a columnar table in POI_SCHEMA (empty on failure).
+    """
     print(f"Fetching ALL POIs from OpenStreetMap...")
     print(f"  Bounding box: N={BBOX['north']}, S={BBOX['south']}, E={BBOX['east']}, W={BBOX['west']}")
     
     try:
-        # Fetch everything in one big query
-        gdf = ox.features_from_bbox(
-            bbox=(BBOX['west'], BBOX['south'], BBOX['east'], BBOX['north']),
-            tags=TAGS
-        )
+        # Fetch the tiles in parallel; features straddling a tile edge come back
+        # from each tile they touch, so drop the repeats
+        tiles = split_bbox(BBOX, TILE_GRID)
+        print(f"  Fetching {len(tiles)} tiles ({OVERPASS_WORKERS} at a time)")
+        with ThreadPoolExecutor(max_workers=OVERPASS_WORKERS) as pool:
+            frames = list(pool.map(fetch_tile, tiles))
+        raw = pd.concat(frames, ignore_index=True).drop_duplicates(subset=['osm_type', 'osm_id'])
+        
+        print(f"  Raw elements found: {len(raw)}")
+        
+        # 1. Determine Type (blacklisted rows are dropped)
+        classified = classify_pois(raw)
+        skipped_blacklist = len(raw) - len(classified)
+        raw = raw.loc[classified.index]
+        poi_types = classified['type'].astype(object)
+        subtypes = classified['subtype']
         
-        print(f"  Raw nodes found: {len(gdf)}")
+        # 2. Extract Geometry
+        locations = [f"POINT({lon} {lat})" for lon, lat in zip(raw['lon'].to_numpy(), raw['lat'].to_numpy())]
         
-        pois = []
-        skipped_blacklist = 0
-        skipped_unknown = 0
+        # 3. Extract IDs and Names
+        osm_ids = raw['osm_id'].astype('int64')
+        names = get_tag(raw, 'name')
+        names = names.where(names.notna(), 'Unnamed ' + subtypes)
         
-        for idx, row in gdf.iterrows():
-            # 1. Determine Type
-            poi_type, subtype = determine_type(row)
-            
-            if poi_type is None:
-                skipped_blacklist += 1
-                continue  # Skip blacklisted items
-            
-            # 2. Extract Geometry
-            if row.geometry.geom_type == 'Point':
-                lon, lat = row.geometry.x, row.geometry.y
-            else:
-                centroid = row.geometry.centroid
-                lon, lat = centroid.x, centroid.y
-            
-            # 3. Extract IDs and Names
-            osm_id = idx[1] if isinstance(idx, tuple) else idx
-            name = row.get('name', None)
-            
-            # 4. Extract Extra Data (Opening Hours)
-            opening_hours = row.get('opening_hours', None)
-            
-            pois.append({
-                'name': name if isinstance(name, str) else f"Unnamed {subtype}",
-                'type': poi_type,
-                'subtype': subtype,
-                'location': f"POINT({lon} {lat})",
-                'osm_id': int(osm_id) if osm_id else None,
-                'opening_hours': str(opening_hours) if isinstance(opening_hours, str) else None
-            })
+        # 4. Extract Extra Data (Opening Hours)
+        opening_hours = get_tag(raw, 'opening_hours')
+        
+        df = pd.DataFrame({
+            'name': names.to_numpy(),
+            'type': poi_types.to_numpy(),
+            'subtype': subtypes.to_numpy(),
+            'location': locations,
+            'osm_id': osm_ids.to_numpy(),
+            'opening_hours': opening_hours.to_numpy(),
+        })
+        pois = pa.Table.from_pandas(df, schema=POI_SCHEMA, preserve_index=False)
         
         print(f"  Skipped (blacklisted): {skipped_blacklist}")
-        print(f"  Valid POIs: {len(pois)}")
+        print(f"  Valid POIs: {pois.num_rows}")
         
-        # Count by type
-        type_counts = {}
-        for poi in pois:
-            t = poi['type']
-            type_counts[t] = type_counts.get(t, 0) + 1
+        # Count by type straight from the classified column
+        type_counts = classified['type'].value_counts()
         
         print(f"  Breakdown by type:")
         for t, count in sorted(type_counts.items()):
-            print(f"    - {t}: {count}")
+            if count:
+                print(f"    - {t}: {count}")
         
         return pois
         
@@ -189,47 +331,132 @@ def fetch_all_pois() -> list:
         print(f"  Error fetching POIs: {e}")
         import traceback
         traceback.print_exc()
-        return []
+        return POI_SCHEMA.empty_table()
+
+
+def dedupe_by_osm_id(pois: pa.Table) -> pa.Table:
+    """Drop rows without an osm_id and keep the last row for each osm_id, preserving order."""
+    pois = pois.filter(pois['osm_id'].is_valid())
+    ids = pois['osm_id'].to_numpy()
+    # np.unique on the reversed ids finds each id's last occurrence
+    _, last_from_end = np.unique(ids[::-1], return_index=True)
+    return pois.take(np.sort(len(ids) - 1 - last_from_end))
+
+
+def get_cache_path() -> str:
+    """Parquet cache file for the current BBOX, TAGS and BLACKLIST."""
+    key = str(BBOX) + str(TAGS) + str(sorted(BLACKLIST))
+    return os.path.join(CACHE_DIR, f"pois_{hashlib.md5(key.encode()).hexdigest()}.parquet")
 
 
-def insert_pois_to_supabase(client: Client, pois: list):
+def load_cached_pois() -> pa.Table | None:
+    """Return cached POIs if a fresh cache file exists, otherwise None."""
+    path = get_cache_path()
+    if not os.path.exists(path) or time.time() - os.path.getmtime(path) > CACHE_MAX_AGE:
+        return None
+    
+    pois = pq.read_table(path, schema=POI_SCHEMA)
+    print(f"Loaded {pois.num_rows} POIs from cache: {path}")
+    return pois
+
+
+def save_cached_pois(pois: pa.Table):
+    """Write cleaned POIs to the parquet cache."""
+    path = get_cache_path()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    pq.write_table(pois, path)
+    print(f"  Cached POIs to {path}")
+
+
+async def insert_pois_to_supabase(client: httpx.AsyncClient, pois: pa.Table):
     """
     Insert POIs into Supabase business_nodes table.
     Uses upsert with osm_id as the unique key to avoid duplicates.
+    Batches are upserted concurrently, with at most UPSERT_CONCURRENCY in flight;
+    rows only become dicts inside the batch being sent.
     """
-    if not pois:
+    # Drop POIs without osm_id and keep the last row per osm_id, so no batch
+    # asks Postgres to upsert the same key twice
+    unique_pois = dedupe_by_osm_id(pois)
+    if unique_pois.num_rows < pois.num_rows:
+        print(f"  Dropped {pois.num_rows - unique_pois.num_rows} duplicate or id-less POIs")
+    pois = unique_pois
+    
+    if pois.num_rows == 0:
         print("No POIs to insert.")
         return
     
-    print(f"Inserting {len(pois)} POIs into Supabase...")
+    print(f"Inserting {pois.num_rows} POIs into Supabase...")
     
-    # Insert in batches
-    batch_size = 100
-    inserted = 0
-    errors = 0
+    batch_size = get_batch_size(pois.num_columns)
+    semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
     
-    for i in range(0, len(pois), batch_size):
-        batch = pois[i:i + batch_size]
-        
-        try:
-            # Filter out POIs without osm_id for upsert
-            valid_batch = [p for p in batch if p.get('osm_id')]
-            
-            if valid_batch:
-                result = client.table('business_nodes').upsert(
-                    valid_batch,
-                    on_conflict='osm_id'
-                ).execute()
-                inserted += len(valid_batch)
-        except Exception as e:
-            print(f"  Error inserting batch: {e}")
-            errors += len(batch)
+    results = await asyncio.gather(*[
+        upsert_batch(client, semaphore, 'business_nodes', 'osm_id', pois.slice(i, batch_size))
+        for i in range(0, pois.num_rows, batch_size)
+    ])
+    inserted = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
     
     print(f"  Inserted/updated: {inserted}, Errors: {errors}")
 
 
-def main():
+async def bulk_load_pois(pois: pa.Table):
+    """
+    Bulk-load POIs over a direct Postgres connection.
+    Rows are COPYed into a temp staging table, then merged into
+    business_nodes with a single INSERT ... ON CONFLICT DO UPDATE.
+    """
+    pois = dedupe_by_osm_id(pois)
+    if pois.num_rows == 0:
+        print("No POIs to insert.")
+        return
+    
+    print(f"Bulk loading {pois.num_rows} POIs via COPY...")
+    
+    conn = await get_db_connection()
+    try:
+        async with conn.transaction():
+            await conn.execute("""
+                CREATE TEMP TABLE business_nodes_stage (
+                    name TEXT,
+                    type TEXT,
+                    subtype TEXT,
+                    location TEXT,
+                    osm_id BIGINT,
+                    opening_hours TEXT
+                ) ON COMMIT DROP
+            """)
+            await conn.copy_records_to_table(
+                'business_nodes_stage',
+                records=zip(*(column.to_pylist() for column in pois.columns)),
+                columns=pois.column_names,
+            )
+            status = await conn.execute("""
+                INSERT INTO business_nodes (name, type, subtype, location, osm_id, opening_hours)
+                SELECT name, type, subtype, ST_GeogFromText(location), osm_id, opening_hours
+                FROM business_nodes_stage
+                ON CONFLICT (osm_id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    type = EXCLUDED.type,
+                    subtype = EXCLUDED.subtype,
+                    location = EXCLUDED.location,
+                    opening_hours = EXCLUDED.opening_hours
+            """)
+    finally:
+        await conn.close()
+    
+    # asyncpg returns the command tag, e.g. "INSERT 0 51234"
+    print(f"  Inserted/updated: {status.split()[-1]}")
+
+
+async def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="OSM POI Scraper")
+    parser.add_argument('--bulk', action='store_true',
+                        help="load via Postgres COPY (needs SUPABASE_DB_URL) instead of the REST API")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("OSM POI Scraper for Protest Impact Tracker")
     print("=" * 60)
@@ -239,24 +466,36 @@ def main():
     print(f"  East: {BBOX['east']}, West: {BBOX['west']}")
     print()
     
-    # Initialize Supabase client
-    client = get_supabase_client()
-    print("Connected to Supabase")
-    print()
-    
-    # Fetch ALL POIs in one go
-    all_pois = fetch_all_pois()
+    # Initialize Supabase client (the bulk path connects to Postgres later)
+    client = None
+    if not args.bulk:
+        client = get_supabase_client()
+        print("Connected to Supabase")
+        print()
     
-    print()
-    print(f"Total Cleaned POIs to insert: {len(all_pois)}")
-    print()
-    
-    if all_pois:
-        insert_pois_to_supabase(client, all_pois)
+    try:
+        # Reuse a fresh cache if we have one, otherwise fetch ALL POIs in one go
+        all_pois = load_cached_pois()
+        if all_pois is None:
+            all_pois = fetch_all_pois()
+            if all_pois.num_rows:
+                save_cached_pois(all_pois)
+        
+        print()
+        print(f"Total Cleaned POIs to insert: {all_pois.num_rows}")
+        print()
+        
+        if args.bulk:
+            await bulk_load_pois(all_pois)
+        else:
+            await insert_pois_to_supabase(client, all_pois)
+    finally:
+        if client is not None:
+            await client.aclose()
     
     print()
     print("Done!")
 
 
 if __name__ == '__main__':
-    main()
+    run(main)
@@ -9,19 +9,27 @@ Use responsibly and be aware this may violate Google's ToS.
 
 Usage:
     python popular_times_scraper.py
+    python popular_times_scraper.py --bulk    # load via Postgres COPY (needs SUPABASE_DB_URL)
 
 The script targets ~50 key waypoints along typical protest routes.
 """
 
+import argparse
+import asyncio
 import os
-import sys
-import time
 import json
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from supabase import create_client, Client
+import asyncpg
+import httpx
+import numpy as np
+import pyarrow as pa
+from tqdm import tqdm
+
+from supabase_io import UPSERT_CONCURRENCY, get_db_connection, get_supabase_client, run, upsert_batch
 
 # Try to import populartimes - it may not be available
 try:
@@ -32,12 +40,11 @@ except ImportError:
     print("Warning: 'populartimes' package not found. Using fallback data.")
 
 # Configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')  # Optional - populartimes can work without it
 
 # Key London landmarks along typical protest routes
-# These are high-traffic points suitable for footfall baseline
+# These are high-traffic points suitable for footfall baseline.
+# An entry may also carry a Google "place_id" to skip the nearby search.
 TARGET_PLACES = [
     # Hyde Park / Park Lane corridor (common assembly point)
     {"name": "Hyde Park Corner", "lat": 51.5027, "lng": -0.1527},
@@ -85,199 +92,520 @@ TARGET_PLACES = [
     {"name": "Bloomsbury", "lat": 51.5198, "lng": -0.1270},
 ]
 
+# Source tags stamped on every record. source_date is left to the column
+# default (see migration 005) rather than repeated in every row.
+SOURCE_REAL = 'GOOGLE_POPULAR_TIMES'
+SOURCE_ESTIMATE = 'GOOGLE_POPULAR_TIMES_ESTIMATE'
+
+# Maximum Google lookups in flight at once
+FETCH_CONCURRENCY = 10
+
+# Google lookup rate (requests/second). The rate starts at LOOKUP_RATE and is
+# halved, down to MIN_LOOKUP_RATE, when Google reports we are over quota. A burst
+# of throttled lookups within RATE_LIMIT_COOLDOWN seconds (the first backoff)
+# only halves it once.
+LOOKUP_RATE = 10
+MIN_LOOKUP_RATE = 0.5
+LOOKUP_RETRIES = 4
+RATE_LIMIT_COOLDOWN = 1.0
+
+# populartimes raises PopulartimesException("Google Places <status>", ...) for
+# Places API errors; this is the one that means we are sending too fast
+OVER_QUERY_LIMIT = 'Google Places OVER_QUERY_LIMIT'
+
+# Nearby searches are shared between places whose coordinates round to the
+# same cell; 3 decimal places is ~100 m, the search radius
+LOOKUP_GRID_DECIMALS = 3
+
+# Real popular times are cached on disk between runs. Entries are refetched
+# after a week and dropped entirely after six months.
+CACHE_DIR = 'cache'
+CACHE_PATH = os.path.join(CACHE_DIR, 'popular_times.json')
+CACHE_MAX_AGE = 7 * 24 * 60 * 60
+CACHE_EVICT_AGE = 180 * 24 * 60 * 60
+
+# Rows per upsert request; records arrive a place (168 rows) at a time, so
+# batches stay small instead of waiting for the shared UPSERT_BATCH_SIZE
+UPSERT_BATCH_SIZE = 100
+
+# Places' worth of records buffered between the scraper and the inserter
+RECORD_QUEUE_SIZE = 4
+
+# Places estimated per vectorized pass
+ESTIMATE_CHUNK_SIZE = 500
+
 # Day name mapping
 DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
+# Day index and hour for each cell of a flattened (7, 24) week grid
+SLOT_DAYS = np.repeat(np.arange(7, dtype=np.int8), 24)
+SLOT_HOURS = np.tile(np.arange(24, dtype=np.int8), 7)
+
+# Every records table shares this schema, so real and estimated tables can be
+# concatenated on their way to the inserter
+RECORD_SCHEMA = pa.schema([
+    ('location_name', pa.dictionary(pa.int32(), pa.string())),
+    ('location_point', pa.dictionary(pa.int32(), pa.string())),
+    ('day_of_week', pa.dictionary(pa.int8(), pa.string())),
+    ('hour_of_day', pa.int8()),
+    ('avg_footfall_score', pa.int32()),
+    ('raw_footfall_value', pa.int32()),
+    ('source', pa.dictionary(pa.int32(), pa.string())),
+])
+
+# Estimation masks, indexed by day (rows) and hour (columns)
+HOURS = np.arange(24)
+SATURDAY, SUNDAY = 5, 6
+WEEKEND_ROWS = np.array([False] * 5 + [True] * 2)[:, None]
+WEEKDAY_ROWS = ~WEEKEND_ROWS
+STATION_PEAK_HOURS = ((7 <= HOURS) & (HOURS <= 9)) | ((17 <= HOURS) & (HOURS <= 19))
+TRANSIT_PEAK_HOURS = ((8 <= HOURS) & (HOURS <= 9)) | ((17 <= HOURS) & (HOURS <= 18))
+SHOPPING_HOURS = (10 <= HOURS) & (HOURS <= 18)
+TOURIST_HOURS = (10 <= HOURS) & (HOURS <= 17)
 
-def get_supabase_client() -> Client:
-    """Create and return Supabase client."""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Error: Supabase credentials not found.")
-        sys.exit(1)
+# Baseline busyness for each hour of the day, before location adjustments
+HOUR_BASE = np.array([
+    5, 6, 7, 8, 9, 10,          # Overnight
+    20, 35, 50,                 # Morning ramp up
+    60, 70, 80,                 # Morning peak
+    85, 85,                     # Lunch peak
+    75, 70, 65,                 # Afternoon decline
+    65, 70, 75,                 # Evening peak
+    60, 45, 30,                 # Evening decline
+    15,                         # Late night
+], dtype=np.int16)
+
+
+def is_valid_cache_entry(entry) -> bool:
+    """True if a cache entry has the timestamp and data scrape_place relies on."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get('ts'), (int, float))
+        and isinstance(entry.get('data'), list)
+    )
+
+
+def load_cache() -> dict:
+    """
+    Load cached popular times, dropping entries past CACHE_EVICT_AGE.
+    An unreadable cache, or a malformed entry in it, is ignored rather than fatal.
+    """
+    if not os.path.exists(CACHE_PATH):
+        return {}
     
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    try:
+        with open(CACHE_PATH, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        # ValueError covers both bad JSON and non-UTF-8 bytes
+        print(f"Warning: ignoring unreadable cache {CACHE_PATH}: {e}")
+        return {}
+    
+    if not isinstance(cache, dict):
+        print(f"Warning: ignoring cache {CACHE_PATH}: expected an object, got {type(cache).__name__}")
+        return {}
+    
+    valid = {key: entry for key, entry in cache.items() if is_valid_cache_entry(entry)}
+    if len(valid) < len(cache):
+        print(f"Warning: skipped {len(cache) - len(valid)} malformed cache entries")
+    
+    now = time.time()
+    return {key: entry for key, entry in valid.items() if now - entry['ts'] < CACHE_EVICT_AGE}
+
+
+def save_cache(cache: dict):
+    """Write popular times cache to disk, atomically so an interrupted run can't truncate it."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{CACHE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, CACHE_PATH)
+
 
+def get_cache_key(place_name: str, lat: float, lng: float) -> str:
+    """Cache key for a place."""
+    return f"{place_name}|{lat}|{lng}"
 
-def fetch_popular_times(place_name: str, lat: float, lng: float) -> dict | None:
+
+class RateLimiter:
+    """
+    Async token bucket allowing `rate` acquisitions per second.
+    The rate can be halved at runtime when the remote end starts throttling.
+    """
+    
+    def __init__(self, rate: float, min_rate: float, cooldown: float):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.cooldown = cooldown
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.slowed_at = None
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def slow_down(self):
+        """
+        Halve the rate, not going below min_rate.
+        Calls within `cooldown` seconds of the last halving are ignored, so
+        lookups throttled together only count once.
+        """
+        now = time.monotonic()
+        if self.slowed_at is not None and now - self.slowed_at < self.cooldown:
+            return
+        self.slowed_at = now
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, self.rate)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True if Google refused the request for exceeding the query rate or quota."""
+    # HTTP 429 from requests (response.status_code) or urllib (code)
+    status = getattr(getattr(error, 'response', None), 'status_code', None) or getattr(error, 'code', None)
+    if status == 429:
+        return True
+    return bool(error.args) and error.args[0] == OVER_QUERY_LIMIT
+
+
+def fetch_popular_times(place_name: str, lat: float, lng: float,
+                        place_id: str | None = None) -> tuple[str | None, list | None]:
     """
     Fetch Popular Times data for a location.
     
-    Returns dict with hourly data for each day, or None if unavailable.
+    With a known place_id this is a single Place Details lookup. Otherwise the
+    place is found with a nearby search, and its id is returned so later runs
+    can skip the search.
+    
+    Returns (place_id, hourly data for each day), with None for anything unavailable.
+    Rate-limit errors are raised so the caller can back off and retry.
     """
     if not POPULARTIMES_AVAILABLE or not GOOGLE_API_KEY:
-        return None
+        return place_id, None
     
     try:
+        if place_id:
+            place = populartimes.get_id(GOOGLE_API_KEY, place_id)
+            return place_id, place.get('populartimes')
+        
         # Try to find the place and get popular times
         # This uses Google Places API under the hood
         results = populartimes.get(GOOGLE_API_KEY, ['establishment'], (lat, lng), (lat, lng), radius=100)
         
         for place in results:
             if place.get('populartimes'):
-                return place['populartimes']
+                return place['id'], place['populartimes']
         
-        return None
+        return None, None
     except Exception as e:
-        print(f"  Error fetching {place_name}: {e}")
-        return None
+        if is_rate_limited(e):
+            raise
+        tqdm.write(f"  Error fetching {place_name}: {e}")
+        return place_id, None
 
 
-def generate_estimated_popular_times(place_name: str, lat: float, lng: float) -> list:
+def build_records_table(places: list, place_idx: np.ndarray, source: str,
+                        days: np.ndarray, hours: np.ndarray, scores: np.ndarray) -> pa.Table:
+    """
+    Build records for one or more places as a columnar table.
+    Row i belongs to places[place_idx[i]]. Per-place values and day names are
+    dictionary-encoded, so rows only become dicts when a batch is serialized
+    for upsert.
+    """
+    scores = np.asarray(scores, dtype=np.int32)
+    place_idx = np.asarray(place_idx, dtype=np.int32)
+    constant = np.zeros(len(scores), dtype=np.int32)
+    
+    return pa.table({
+        'location_name': pa.DictionaryArray.from_arrays(place_idx, [p['name'] for p in places]),
+        'location_point': pa.DictionaryArray.from_arrays(
+            place_idx, [f"POINT({p['lng']} {p['lat']})" for p in places]
+        ),
+        'day_of_week': pa.DictionaryArray.from_arrays(np.asarray(days, dtype=np.int8), DAYS),
+        'hour_of_day': np.asarray(hours, dtype=np.int8),
+        'avg_footfall_score': scores,
+        'raw_footfall_value': scores * 100,
+        'source': pa.DictionaryArray.from_arrays(constant, [source]),
+    }, schema=RECORD_SCHEMA)
+
+
+def classify_place(place_name: str) -> tuple[bool, bool, bool, bool]:
+    """Determine location type based on name: (station, shopping, landmark, transit)."""
+    name = place_name.lower()
+    is_station = 'station' in name
+    is_shopping = any(x in name for x in ['circus', 'square', 'street', 'garden'])
+    is_landmark = any(x in name for x in ['cathedral', 'abbey', 'eye', 'bridge', 'ben'])
+    is_transit = is_station or 'bridge' in name
+    return is_station, is_shopping, is_landmark, is_transit
+
+
+# Location type flags for every target place, computed once at import
+PLACE_FLAGS = {place['name']: classify_place(place['name']) for place in TARGET_PLACES}
+
+
+def generate_estimated_popular_times(places: list) -> pa.Table:
     """
     Generate estimated popular times based on location type and position.
     
     This provides realistic estimates when scraping isn't available.
+    All places are computed at once as a (places, 7, 24) grid of scores.
     """
-    # Determine location type based on name/position
-    is_station = 'station' in place_name.lower()
-    is_shopping = any(x in place_name.lower() for x in ['circus', 'square', 'street', 'garden'])
-    is_landmark = any(x in place_name.lower() for x in ['cathedral', 'abbey', 'eye', 'bridge', 'ben'])
-    is_transit = is_station or 'bridge' in place_name.lower()
+    flags = np.array(
+        [PLACE_FLAGS.get(p['name']) or classify_place(p['name']) for p in places], dtype=bool
+    ).reshape(-1, 4, 1, 1)
+    is_station, is_shopping, is_landmark, is_transit = flags[:, 0], flags[:, 1], flags[:, 2], flags[:, 3]
     
-    records = []
+    grid = np.tile(HOUR_BASE, (len(places), 7, 1))
     
-    for day_idx, day in enumerate(DAYS):
-        is_weekend = day in ['Saturday', 'Sunday']
-        
-        for hour in range(24):
-            # Base pattern
-            if 0 <= hour < 6:
-                base = 5 + hour
-            elif 6 <= hour < 9:
-                base = 20 + (hour - 6) * 15  # Morning ramp up
-            elif 9 <= hour < 12:
-                base = 60 + (hour - 9) * 10  # Morning peak
-            elif 12 <= hour < 14:
-                base = 85  # Lunch peak
-            elif 14 <= hour < 17:
-                base = 75 - (hour - 14) * 5  # Afternoon decline
-            elif 17 <= hour < 20:
-                base = 65 + (hour - 17) * 5  # Evening peak
-            elif 20 <= hour < 23:
-                base = 60 - (hour - 20) * 15  # Evening decline
-            else:
-                base = 15
-            
-            # Adjust for location type
-            if is_station:
-                # Stations have strong commuter peaks on weekdays
-                if not is_weekend and (7 <= hour <= 9 or 17 <= hour <= 19):
-                    base = min(100, base + 25)
-                elif is_weekend:
-                    base = int(base * 0.7)
-            
-            if is_shopping:
-                # Shopping areas busy on weekends
-                if is_weekend and 10 <= hour <= 18:
-                    base = min(100, base + 20)
-            
-            if is_landmark:
-                # Landmarks steady during tourist hours
-                if 10 <= hour <= 17:
-                    base = max(base, 50)
-            
-            if is_transit:
-                # Transit areas have commuter patterns
-                if not is_weekend and (8 <= hour <= 9 or 17 <= hour <= 18):
-                    base = min(100, base + 15)
-            
-            # Weekend adjustments
-            if is_weekend:
-                if day == 'Saturday':
-                    base = int(base * 1.1)  # Saturday slightly busier
-                else:
-                    base = int(base * 0.85)  # Sunday quieter
-            
-            # Ensure 0-100 range
-            score = max(0, min(100, int(base)))
-            
-            records.append({
-                'location_name': place_name,
-                'location_point': f"POINT({lng} {lat})",
-                'day_of_week': day,
-                'hour_of_day': hour,
-                'avg_footfall_score': score,
-                'raw_footfall_value': score * 100,
-                'source': 'GOOGLE_POPULAR_TIMES_ESTIMATE',
-                'source_date': '2024-01-01'
-            })
-    
-    return records
-
-
-def scrape_all_places() -> list:
-    """Scrape or estimate popular times for all target places."""
-    all_records = []
-    
-    print(f"Processing {len(TARGET_PLACES)} locations...")
-    print()
+    # Adjust for location type
+    # Stations have strong commuter peaks on weekdays
+    grid = np.where(is_station & WEEKDAY_ROWS & STATION_PEAK_HOURS, np.minimum(100, grid + 25), grid)
+    grid = np.where(is_station & WEEKEND_ROWS, (grid * 0.7).astype(int), grid)
     
-    for i, place in enumerate(TARGET_PLACES):
-        name = place['name']
-        lat = place['lat']
-        lng = place['lng']
-        
-        print(f"  [{i+1}/{len(TARGET_PLACES)}] {name}")
+    # Shopping areas busy on weekends
+    grid = np.where(is_shopping & WEEKEND_ROWS & SHOPPING_HOURS, np.minimum(100, grid + 20), grid)
+    
+    # Landmarks steady during tourist hours
+    grid = np.where(is_landmark & TOURIST_HOURS, np.maximum(grid, 50), grid)
+    
+    # Transit areas have commuter patterns
+    grid = np.where(is_transit & WEEKDAY_ROWS & TRANSIT_PEAK_HOURS, np.minimum(100, grid + 15), grid)
+    
+    # Weekend adjustments
+    grid[:, SATURDAY] = (grid[:, SATURDAY] * 1.1).astype(int)   # Saturday slightly busier
+    grid[:, SUNDAY] = (grid[:, SUNDAY] * 0.85).astype(int)      # Sunday quieter
+    
+    # Ensure 0-100 range
+    scores = np.clip(grid, 0, 100).ravel()
+    
+    place_idx = np.repeat(np.arange(len(places), dtype=np.int32), 7 * 24)
+    days = np.tile(SLOT_DAYS, len(places))
+    hours = np.tile(SLOT_HOURS, len(places))
+    
+    return build_records_table(places, place_idx, SOURCE_ESTIMATE, days, hours, scores)
+
+
+async def lookup_popular_times(limiter: RateLimiter, semaphore: asyncio.Semaphore, name: str,
+                               lat: float, lng: float, place_id: str | None) -> tuple[str | None, list | None]:
+    """
+    Run one Google lookup, at most FETCH_CONCURRENCY at a time and paced by the limiter.
+    When Google throttles, the shared rate is halved and the lookup retried with backoff.
+    """
+    # Nothing to pace when no lookup can be made
+    if not POPULARTIMES_AVAILABLE or not GOOGLE_API_KEY:
+        return place_id, None
+    
+    for attempt in range(LOOKUP_RETRIES + 1):
+        await limiter.acquire()
+        try:
+            # populartimes is blocking, so each lookup runs on a worker thread
+            async with semaphore:
+                return await asyncio.to_thread(fetch_popular_times, name, lat, lng, place_id)
+        except Exception as e:
+            limiter.slow_down()
+            tqdm.write(f"  Rate limited fetching {name}: {e} (now {limiter.rate:g} req/s)")
+            if attempt < LOOKUP_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+    
+    tqdm.write(f"  Error fetching {name}: still rate limited after {LOOKUP_RETRIES} retries")
+    return place_id, None
+
+
+async def scrape_place(limiter: RateLimiter, semaphore: asyncio.Semaphore, queue: asyncio.Queue,
+                       cache: dict, lookups: dict, progress: tqdm, place: dict) -> int | None:
+    """
+    Fetch popular times for one place and queue its records for insertion.
+    Returns the number of records, or None if the place needs estimating.
+    """
+    name = place['name']
+    lat = place['lat']
+    lng = place['lng']
+    
+    key = get_cache_key(name, lat, lng)
+    entry = cache.get(key)
+    
+    if entry and time.time() - entry['ts'] < CACHE_MAX_AGE:
+        popular_times = entry['data']
+    else:
+        # Reuse a place_id from TARGET_PLACES or an earlier run to skip the nearby search
+        place_id = place.get('place_id') or (entry or {}).get('place_id')
         
-        # Try to fetch real data first
-        popular_times = fetch_popular_times(name, lat, lng)
+        # Places sharing a place_id or grid cell share a single lookup
+        lookup_key = place_id or (round(lat, LOOKUP_GRID_DECIMALS), round(lng, LOOKUP_GRID_DECIMALS))
+        if lookup_key not in lookups:
+            lookups[lookup_key] = asyncio.create_task(
+                lookup_popular_times(limiter, semaphore, name, lat, lng, place_id)
+            )
+        place_id, popular_times = await lookups[lookup_key]
         
         if popular_times:
-            # Parse the populartimes format
-            for day_data in popular_times:
-                day_idx = day_data.get('day', 0)
-                day_name = DAYS[day_idx]
-                
-                for hour, popularity in enumerate(day_data.get('data', [])):
-                    all_records.append({
-                        'location_name': name,
-                        'location_point': f"POINT({lng} {lat})",
-                        'day_of_week': day_name,
-                        'hour_of_day': hour,
-                        'avg_footfall_score': popularity,
-                        'raw_footfall_value': popularity * 100,
-                        'source': 'GOOGLE_POPULAR_TIMES',
-                        'source_date': '2024-01-01'
-                    })
-            
-            print(f"      ✓ Real data fetched")
+            cache[key] = {'ts': time.time(), 'place_id': place_id, 'data': popular_times}
+    
+    progress.update()
+    
+    if not popular_times:
+        return None
+    
+    # Parse the populartimes format: [{'name': 'Monday', 'data': [24 scores]}, ...]
+    days, hours, scores = [], [], []
+    for day_data in popular_times:
+        if day_data.get('name') in DAYS:
+            day_idx = DAYS.index(day_data['name'])
         else:
-            # Use estimated data
-            records = generate_estimated_popular_times(name, lat, lng)
-            all_records.extend(records)
-            print(f"      ~ Estimated data generated")
+            day_idx = day_data.get('day', 0)
+        data = day_data.get('data', [])
         
-        # Rate limiting
-        time.sleep(0.1)
+        days += [day_idx] * len(data)
+        hours += range(len(data))
+        scores += data
     
-    return all_records
+    records = build_records_table(
+        [place], np.zeros(len(scores), dtype=np.int32), SOURCE_REAL,
+        np.array(days, dtype=np.int8), np.array(hours, dtype=np.int8), scores
+    )
+    await queue.put(records)
+    return records.num_rows
 
 
-def insert_records(client: Client, records: list):
-    """Insert records into Supabase."""
-    print()
-    print(f"Inserting {len(records)} records into Supabase...")
+async def scrape_all_places(queue: asyncio.Queue) -> int:
+    """
+    Scrape or estimate popular times for all target places.
+    Places are fetched concurrently, at most FETCH_CONCURRENCY at a time and no
+    faster than the adaptive LOOKUP_RATE, and each place's records are put on
+    the queue as soon as they are ready.
+    Places without real data are then estimated together in one pass.
+    A final None marks the end of the stream; it is only sent on success, so
+    a failed scrape never blocks on a queue nobody is draining.
+    """
+    limiter = RateLimiter(LOOKUP_RATE, MIN_LOOKUP_RATE, RATE_LIMIT_COOLDOWN)
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+    cache = load_cache()
+    lookups = {}
+    try:
+        with tqdm(total=len(TARGET_PLACES), desc="Processing locations", unit="place") as progress:
+            counts = await asyncio.gather(*[
+                scrape_place(limiter, semaphore, queue, cache, lookups, progress, place)
+                for place in TARGET_PLACES
+            ])
+        
+        missing = [place for place, count in zip(TARGET_PLACES, counts) if count is None]
+        total = sum(count for count in counts if count is not None)
+        print(f"  ✓ Real data fetched for {len(TARGET_PLACES) - len(missing)} places")
+        # Estimate in chunks so a long place list never becomes one huge table
+        for i in range(0, len(missing), ESTIMATE_CHUNK_SIZE):
+            estimated = generate_estimated_popular_times(missing[i:i + ESTIMATE_CHUNK_SIZE])
+            await queue.put(estimated)
+            total += estimated.num_rows
+        if missing:
+            print(f"  ~ Estimated data generated for {len(missing)} places")
+        
+        await queue.put(None)
+    finally:
+        # Keep whatever was fetched, even if the run was interrupted
+        save_cache(cache)
     
-    batch_size = 100
+    return total
+
+
+async def insert_records(client: httpx.AsyncClient, queue: asyncio.Queue):
+    """
+    Insert records into Supabase as they arrive on the queue.
+    Full batches are upserted straight away, with up to UPSERT_CONCURRENCY
+    requests in flight, so insertion overlaps with scraping. When that many
+    batches are outstanding, the queue stops being drained, which holds back
+    the scraper, so memory stays bounded however many places there are.
+    """
+    semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+    in_flight = set()
     inserted = 0
+    pending = None
     
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i + batch_size]
-        
-        try:
-            client.table('footfall_baseline').upsert(
-                batch,
-                on_conflict='location_name,day_of_week,hour_of_day,source'
-            ).execute()
-            inserted += len(batch)
-        except Exception as e:
-            print(f"  Error: {e}")
+    async def submit(batch: pa.Table):
+        nonlocal inserted
+        if len(in_flight) >= UPSERT_CONCURRENCY:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            inserted += sum(task.result()[0] for task in done)
+        in_flight.add(asyncio.create_task(upsert_batch(
+            client, semaphore, 'footfall_baseline', 'location_name,day_of_week,hour_of_day,source', batch)))
     
+    while (records := await queue.get()) is not None:
+        # Concatenating and slicing tables is zero-copy
+        pending = records if pending is None else pa.concat_tables([pending, records])
+        while pending.num_rows >= UPSERT_BATCH_SIZE:
+            batch, pending = pending.slice(0, UPSERT_BATCH_SIZE), pending.slice(UPSERT_BATCH_SIZE)
+            await submit(batch)
+    
+    if pending is not None and pending.num_rows:
+        await submit(pending)
+    
+    inserted += sum(written for written, _ in await asyncio.gather(*in_flight))
     print(f"  Inserted/updated: {inserted} records")
 
 
-def main():
+async def bulk_load_records(conn: asyncpg.Connection, queue: asyncio.Queue):
+    """
+    Bulk-load records from the queue over a direct Postgres connection.
+    Each place's rows are COPYed into a temp staging table as they arrive,
+    then merged into footfall_baseline with a single INSERT ... ON CONFLICT DO UPDATE.
+    Postgres refuses to update the same row twice in one statement, so only the
+    last staged row per key is merged (as the REST upserts would leave it).
+    """
+    async with conn.transaction():
+        await conn.execute("""
+            CREATE TEMP TABLE footfall_stage (
+                staged_order BIGSERIAL,
+                location_name TEXT,
+                location_point TEXT,
+                day_of_week TEXT,
+                hour_of_day INTEGER,
+                avg_footfall_score INTEGER,
+                raw_footfall_value BIGINT,
+                source TEXT
+            ) ON COMMIT DROP
+        """)
+        while (records := await queue.get()) is not None:
+            await conn.copy_records_to_table(
+                'footfall_stage',
+                records=zip(*(column.to_pylist() for column in records.columns)),
+                columns=records.column_names,
+            )
+        status = await conn.execute("""
+            INSERT INTO footfall_baseline (
+                location_name, location_point, day_of_week, hour_of_day,
+                avg_footfall_score, raw_footfall_value, source
+            )
+            SELECT DISTINCT ON (location_name, day_of_week, hour_of_day, source)
+                   location_name, ST_GeogFromText(location_point), day_of_week, hour_of_day,
+                   avg_footfall_score, raw_footfall_value, source
+            FROM footfall_stage
+            ORDER BY location_name, day_of_week, hour_of_day, source, staged_order DESC
+            ON CONFLICT (location_name, day_of_week, hour_of_day, source) DO UPDATE SET
+                location_point = EXCLUDED.location_point,
+                avg_footfall_score = EXCLUDED.avg_footfall_score,
+                raw_footfall_value = EXCLUDED.raw_footfall_value
+        """)
+    
+    # asyncpg returns the command tag, e.g. "INSERT 0 5208"
+    print(f"  Inserted/updated: {status.split()[-1]} records")
+
+
+async def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Google Popular Times Scraper")
+    parser.add_argument('--bulk', action='store_true',
+                        help="load via Postgres COPY (needs SUPABASE_DB_URL) instead of the REST API")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Google Popular Times Scraper")
     print("=" * 60)
@@ -293,20 +621,41 @@ def main():
         print("Will generate estimated data based on location patterns.")
         print()
     
-    client = get_supabase_client()
+    # Connect up front so a bad connection fails before any scraping
+    if args.bulk:
+        conn = await get_db_connection()
+    else:
+        client = get_supabase_client()
     print("Connected to Supabase")
     print()
     
-    records = scrape_all_places()
-    
-    print()
-    print(f"Total records: {len(records)}")
+    # Records flow from the scraper to the inserter while places are still being fetched
+    queue = asyncio.Queue(maxsize=RECORD_QUEUE_SIZE)
+    scraper = asyncio.create_task(scrape_all_places(queue))
+    if args.bulk:
+        inserter = asyncio.create_task(bulk_load_records(conn, queue))
+    else:
+        inserter = asyncio.create_task(insert_records(client, queue))
     
-    insert_records(client, records)
+    try:
+        # If either side fails, the other would wait on the queue forever: cancel it
+        done, pending = await asyncio.wait({scraper, inserter}, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
+    finally:
+        if args.bulk:
+            await conn.close()
+        else:
+            await client.aclose()
     
+    print()
+    print(f"Total records: {scraper.result()}")
     print()
     print("Done!")
 
 
 if __name__ == '__main__':
-    main()
+    run(main)
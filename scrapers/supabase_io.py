@@ -0,0 +1,133 @@
+"""
+Shared helpers for the scrapers: Supabase connections, batched upserts
+and the asyncio entry point.
+
+Credentials are read from the environment (or .env):
+    SUPABASE_URL, SUPABASE_SERVICE_KEY     REST (PostgREST) upserts
+    SUPABASE_DB_URL                        direct Postgres, only needed for --bulk
+"""
+
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import asyncpg
+import httpx
+import orjson
+import pyarrow as pa
+from tqdm import tqdm
+
+# uvloop is optional: a faster drop-in event loop where available (not on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Configuration
+SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('VITE_SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
+SUPABASE_DB_URL = os.getenv('SUPABASE_DB_URL')  # Direct Postgres connection, only needed for --bulk
+
+# Upsert tuning: rows per request and number of requests kept in flight
+UPSERT_BATCH_SIZE = 2000
+UPSERT_CONCURRENCY = 8
+
+# Defensive cap on rows x columns per REST batch. PostgREST sends the whole JSON
+# body as a single parameter (json_populate_recordset($1)), so for the scrapers'
+# narrow tables this never binds; it only guards against a very wide payload.
+MAX_BATCH_PARAMS = 65000
+
+# PostgREST statuses that mean some row in the batch was bad (malformed
+# value, constraint violation, payload too large), worth bisecting
+REJECTED_BATCH_STATUSES = frozenset({400, 409, 413, 422})
+
+
+def get_batch_size(num_fields: int, batch_size: int = UPSERT_BATCH_SIZE) -> int:
+    """Rows per upsert: batch_size, clamped by MAX_BATCH_PARAMS for very wide rows."""
+    return max(1, min(batch_size, MAX_BATCH_PARAMS // max(1, num_fields)))
+
+
+def is_rejected_batch(error: Exception) -> bool:
+    """
+    True if PostgREST rejected the batch's data, so splitting it can isolate the bad rows.
+    Auth, not-found and rate-limit errors would fail every half too, so they are not retried.
+    """
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in REJECTED_BATCH_STATUSES
+
+
+def get_supabase_client(max_connections: int = UPSERT_CONCURRENCY) -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client for the Supabase REST (PostgREST) API.
+    One client is shared by every batch so connections are reused.
+    """
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("Error: Supabase credentials not found.")
+        print("Set SUPABASE_URL and SUPABASE_SERVICE_KEY in your environment or .env file")
+        sys.exit(1)
+
+    return httpx.AsyncClient(
+        base_url=f"{SUPABASE_URL}/rest/v1",
+        headers={
+            'apikey': SUPABASE_KEY,
+            'Authorization': f"Bearer {SUPABASE_KEY}",
+            'Content-Type': 'application/json',
+            'Prefer': 'resolution=merge-duplicates,return=minimal',
+        },
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=max_connections, max_connections=max_connections),
+        timeout=30.0,
+    )
+
+
+async def upsert_batch(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                       table: str, on_conflict: str, batch: pa.Table) -> tuple[int, int]:
+    """
+    Upsert one batch into a table, with at most semaphore's limit of requests in flight.
+    Returns (rows written, rows lost).
+    """
+    async with semaphore:
+        try:
+            response = await client.post(
+                f'/{table}',
+                params={'on_conflict': on_conflict},
+                content=orjson.dumps(batch.to_pylist()),
+            )
+            response.raise_for_status()
+            return batch.num_rows, 0
+        except Exception as e:
+            error = e
+    
+    # When is_rejected_batch says the data itself was refused, retry each half
+    # so only the offending rows are lost. Any other error fails the whole batch.
+    if not is_rejected_batch(error) or batch.num_rows == 1:
+        # tqdm.write keeps a running progress bar intact (and is a plain print otherwise)
+        tqdm.write(f"  Error inserting batch of {batch.num_rows}: {error}")
+        return 0, batch.num_rows
+    
+    mid = batch.num_rows // 2
+    left, right = await asyncio.gather(
+        upsert_batch(client, semaphore, table, on_conflict, batch.slice(0, mid)),
+        upsert_batch(client, semaphore, table, on_conflict, batch.slice(mid)),
+    )
+    return left[0] + right[0], left[1] + right[1]
+
+
+async def get_db_connection() -> asyncpg.Connection:
+    """Open a direct Postgres connection for bulk loads."""
+    if not SUPABASE_DB_URL:
+        print("Error: Postgres connection string not found.")
+        print("Set SUPABASE_DB_URL in your environment or .env file to use --bulk")
+        sys.exit(1)
+
+    return await asyncpg.connect(SUPABASE_DB_URL)
+
+
+def run(main):
+    """Run a scraper's async main() to completion, on uvloop when it is installed."""
+    if uvloop:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -0,0 +1,9 @@
+-- Migration: Default footfall_baseline.source_date for baseline loads
+-- Run this in Supabase SQL Editor
+
+-- 1. Every baseline row is currently stamped with the same reference date, so
+--    the scrapers can leave source_date out of the payload and let it default
+ALTER TABLE footfall_baseline ALTER COLUMN source_date SET DEFAULT '2024-01-01';
+
+-- 2. Comment explaining the default
+COMMENT ON COLUMN footfall_baseline.source_date IS 'Reference date of the baseline data; defaults to 2024-01-01 when not supplied';